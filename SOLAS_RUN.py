@@ -2,23 +2,193 @@ import re
 import requests
 import textwrap
 import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+class _HostGate:
+    """Token bucket plus connection cap for a single upstream host."""
+    def __init__(self, rate, burst, concurrency):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.blocked_until = 0.0
+        self.parked = None
+        self.concurrency = concurrency
+        self.active = 0
+        self.slot_free = threading.Condition()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def update(self, rate=None, burst=None, concurrency=None):
+        # Limits change in place so in-flight requests keep sharing one cap
+        if rate:
+            self.rate = rate
+        if burst:
+            self.burst = burst
+            self.tokens = min(self.tokens, burst)
+        if concurrency:
+            with self.slot_free:
+                self.concurrency = concurrency
+                self.slot_free.notify_all()
+
+    def acquire(self):
+        with self.slot_free:
+            while self.active >= self.concurrency:
+                self.slot_free.wait()
+            self.active += 1
+
+    def release(self):
+        with self.slot_free:
+            self.active -= 1
+            self.slot_free.notify_all()
+
+class SolasScheduler:
+    """Queues @net requests per host instead of hammering a throttled upstream."""
+    THROTTLE_CODES = (429, 503)
+
+    def __init__(self, rate=5.0, burst=5, concurrency=4, max_requeues=5, max_retry_after=60.0, session=None):
+        self.defaults = (rate, burst, concurrency)
+        self.max_requeues = max_requeues
+        self.max_retry_after = max_retry_after
+        self.session = session or requests.Session()
+        self.gates = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "coalesced": 0, "throttled": 0, "queue_wait": 0.0}
+
+    def configure(self, url, rate=None, burst=None, concurrency=None):
+        for name, value in (("rate", rate), ("burst", burst), ("concurrency", concurrency)):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name}({value}) must be greater than zero")
+        if rate and not burst:
+            burst = max(1, int(rate))
+        host = urlsplit(url).netloc
+        with self.lock:
+            gate = self.gates.get(host)
+            if gate is None:
+                d_rate, d_burst, d_conc = self.defaults
+                self.gates[host] = _HostGate(rate or d_rate, burst or d_burst, concurrency or d_conc)
+            else:
+                gate.refill(time.monotonic())
+                gate.update(rate, burst, concurrency)
+
+    def _gate(self, host):
+        with self.lock:
+            if host not in self.gates:
+                self.gates[host] = _HostGate(*self.defaults)
+            return self.gates[host]
+
+    def _admit(self, gate):
+        # Slot first, then token and park check, so a 429 seen while this
+        # request waited for a slot still holds it back
+        while True:
+            gate.acquire()
+            with self.lock:
+                now = time.monotonic()
+                gate.refill(now)
+                if gate.blocked_until - now > self.max_retry_after:
+                    gate.release()
+                    return gate.parked
+                if now >= gate.blocked_until and gate.tokens >= 1:
+                    gate.tokens -= 1
+                    return None
+                delay = max(gate.blocked_until - now, (1 - gate.tokens) / gate.rate)
+            gate.release()
+            time.sleep(delay)
+
+    def _retry_after(self, res):
+        value = res.headers.get("Retry-After", "1")
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return 1.0
+
+    def _fetch(self, url, headers):
+        gate = self._gate(urlsplit(url).netloc)
+        for attempt in range(self.max_requeues + 1):
+            queued = time.monotonic()
+            parked = self._admit(gate)
+            if parked is not None:
+                # Host asked for a wait longer than max_retry_after: fail fast
+                return parked
+            try:
+                with self.lock:
+                    self.stats["queue_wait"] += time.monotonic() - queued
+                    self.stats["requests"] += 1
+                res = self.session.get(url, headers=headers)
+            finally:
+                gate.release()
+            if res.status_code not in self.THROTTLE_CODES:
+                return res
+            # Throttled: park the whole host until Retry-After, then requeue
+            wait = self._retry_after(res)
+            with self.lock:
+                self.stats["throttled"] += 1
+                gate.blocked_until = max(gate.blocked_until, time.monotonic() + wait)
+                gate.parked = res
+            if wait > self.max_retry_after or attempt == self.max_requeues:
+                return res
+        return res
+
+    def get(self, url, headers=None):
+        headers = headers or {}
+        key = (url, tuple(sorted(headers.items())))
+        with self.lock:
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.inflight[key] = {"done": threading.Event()}
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            flight["done"].wait()
+            if "error" in flight:
+                raise flight["error"]
+            return flight["result"]
+        try:
+            flight["result"] = self._fetch(url, headers)
+            return flight["result"]
+        except Exception as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            flight["done"].set()
 
 class SolasRuntime:
-    def __init__(self):
+    def __init__(self, scheduler=None):
         self.env = {"api_key": "SOLAS_DEMO_TOKEN_123"}
         self.context = {}
         self.storage = {}
+        self.scheduler = scheduler or SolasScheduler()
+        self.stats = self.scheduler.stats
 
     def _handle_net_logic(self, block):
         auth_match = re.search(r'secure with @env\.(\w+)', block)
         retry_match = re.search(r'retry\((\d+)\)', block)
+        rate_match = re.search(r'^\s*rate\((\d+(?:\.\d+)?)\)\s*$', block, re.M)
+        conc_match = re.search(r'^\s*concurrency\((\d+)\)\s*$', block, re.M)
         headers = {}
         if auth_match:
             env_key = auth_match.group(1)
             token = self.env.get(env_key, "MISSING_KEY")
             headers = {'Authorization': f'Bearer {token}'}
         retries = int(retry_match.group(1)) if retry_match else 1
-        return headers, retries
+        limits = {}
+        if rate_match:
+            limits["rate"] = float(rate_match.group(1))
+        if conc_match:
+            limits["concurrency"] = int(conc_match.group(1))
+        return headers, retries, limits
 
     def _handle_data(self, script):
         script = re.sub(r'store (.*?) as (\w+)', r'self.storage["\2"] = \1', script)
@@ -35,17 +205,25 @@ class SolasRuntime:
 
     def _handle_stream(self, match):
         var, url, block = match.groups()
-        headers, retries = self._handle_net_logic(block)
+        headers, retries, limits = self._handle_net_logic(block)
+        # Limits apply when this stream runs, not when the script is translated
+        configure = f"self.scheduler.configure('{url}', **{limits})\n" if limits else ""
 
         # Clean and indent
         lines = [l.strip() for l in block.split('\n') if l.strip()]
-        logic = "\n".join(["        " + l for l in lines if not any(k in l for k in ['secure', 'retry'])])
+        logic = "\n".join(["        " + l for l in lines
+                           if not any(k in l for k in ['secure', 'retry'])
+                           and not re.fullmatch(r'(rate\(\d+(\.\d+)?\)|concurrency\(\d+\))', l)])
 
         # Use triple quotes for the block to prevent any quote nesting errors
         return f"""
-for _ in range({retries}):
+{configure}for _ in range({retries}):
     try:
-        res = requests.get('{url}', headers={headers})
+        res = self.scheduler.get('{url}', headers={headers})
+        if res.status_code in self.scheduler.THROTTLE_CODES:
+            # The scheduler already requeued; retrying here only adds load
+            print(f"Drifting: upstream throttled ({{res.status_code}})")
+            break
         res.raise_for_status()
         {var} = res.json()
 {logic}
@@ -57,11 +235,11 @@ for _ in range({retries}):
     def run(self, script):
         import textwrap
         script = textwrap.dedent(script).strip()
-        script = re.sub(r'//.*', '', script)
+        script = re.sub(r'(?<!:)//.*', '', script)
 
         script = self._handle_data(script)
         script = re.sub(r'grow (\w+) to (\d+) \{ init \[(.*)\] step: (.*) \}', self._handle_grow, script)
-        script = re.sub(r'stream (\w+) from @net\.(?:api|stream)\("(.*)"\) \{(.*?)\}', self._handle_stream, script, flags=re.DOTALL)
+        script = re.sub(r'stream (\w+) from @net\.(?:api|stream)\("([^"]*)"\) \{(.*?)\}', self._handle_stream, script, flags=re.DOTALL)
 
         # FIXED EMIT: Uses a safer template that doesn't care about internal quotes
         script = re.sub(r'emit "(.*)"', r'print(f"""\1""")', script)
@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from SOLAS_RUN import SolasRuntime, SolasScheduler
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """Mock upstream: answers 429 for the first `throttle_first` hits, then JSON."""
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            server.arrivals.append((time.monotonic(), self.path))
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            throttled = server.hits <= server.throttle_first
+        time.sleep(server.latency)
+        with server.lock:
+            server.active -= 1
+        if throttled:
+            self.send_response(429)
+            self.send_header("Retry-After", server.retry_after)
+            self.end_headers()
+            return
+        body = json.dumps({"title": "ok", "path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestSolasScheduler(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+        self.server.lock = threading.Lock()
+        self.server.hits = self.server.active = self.server.peak = 0
+        self.server.arrivals = []
+        self.server.throttle_first = 0
+        self.server.latency = 0.0
+        self.server.retry_after = "0.2"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _burst(self, scheduler, urls):
+        results = [None] * len(urls)
+        def fetch(i, url):
+            results[i] = scheduler.get(url)
+        threads = [threading.Thread(target=fetch, args=(i, u)) for i, u in enumerate(urls)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_retry_after_queues_instead_of_failing(self):
+        """A 429 with Retry-After must be requeued, not surfaced."""
+        self.server.throttle_first = 2
+        scheduler = SolasScheduler(rate=100, burst=100)
+        start = time.monotonic()
+        res = scheduler.get(f"{self.base}/todo")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(scheduler.stats["throttled"], 2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+
+    def test_retry_after_parks_queued_requests(self):
+        """Requests already holding a token must not slip past a Retry-After park."""
+        self.server.throttle_first = 1
+        self.server.retry_after = "1"
+        self.server.latency = 0.2
+        scheduler = SolasScheduler(rate=100, burst=100, concurrency=1)
+        results = self._burst(scheduler, [f"{self.base}/{i}" for i in range(4)])
+        self.assertTrue(all(r.status_code == 200 for r in results))
+        first, rest = self.server.arrivals[0][0], self.server.arrivals[1:]
+        # The 429 is sent after `latency`; the park lasts one second from there
+        parked_until = first + self.server.latency + 1.0
+        self.assertTrue(all(t >= parked_until - 0.05 for t, _ in rest), self.server.arrivals)
+
+    def test_concurrency_cap_per_host(self):
+        """No more than `concurrency` connections may be open to one host."""
+        self.server.latency = 0.1
+        scheduler = SolasScheduler(rate=100, burst=100, concurrency=2)
+        urls = [f"{self.base}/item/{i}" for i in range(6)]
+        results = self._burst(scheduler, urls)
+        self.assertTrue(all(r.status_code == 200 for r in results))
+        self.assertLessEqual(self.server.peak, 2)
+
+    def test_token_bucket_spacing(self):
+        """Once the burst is spent, requests are released at `rate` per second."""
+        scheduler = SolasScheduler(rate=10, burst=1)
+        start = time.monotonic()
+        for i in range(4):
+            scheduler.get(f"{self.base}/tick/{i}")
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+        self.assertGreater(scheduler.stats["queue_wait"], 0.0)
+
+    def test_coalesce_identical_gets(self):
+        """Identical in-flight GETs share a single upstream request."""
+        self.server.latency = 0.2
+        scheduler = SolasScheduler(rate=100, burst=100)
+        results = self._burst(scheduler, [f"{self.base}/same"] * 5)
+        self.assertEqual(self.server.hits, 1)
+        self.assertEqual(scheduler.stats["coalesced"], 4)
+        self.assertTrue(all(r.json()["path"] == "/same" for r in results))
+
+    def test_stream_block_limits(self):
+        """rate()/concurrency() in a stream block configure the host gate."""
+        engine = SolasRuntime()
+        engine.run(f"""
+        stream todo from @net.api("{self.base}/todos/1") {{
+            rate(2)
+            concurrency(1)
+            store todo['title'] as title
+        }}
+        """)
+        self.assertEqual(engine.storage.get("title"), "ok")
+        gate = engine.scheduler.gates[f"127.0.0.1:{self.server.server_port}"]
+        self.assertEqual(gate.rate, 2.0)
+        self.assertEqual(engine.stats["requests"], 1)
+
+    def test_configure_updates_gate_in_place(self):
+        """Reconfiguring a host must not refill its bucket or reset Retry-After."""
+        scheduler = SolasScheduler(rate=1, burst=1)
+        scheduler.get(f"{self.base}/drain")
+        gate = scheduler.gates[f"127.0.0.1:{self.server.server_port}"]
+        gate.blocked_until = time.monotonic() + 30
+        scheduler.configure(f"{self.base}/other", rate=2, concurrency=3)
+        self.assertIs(scheduler.gates[f"127.0.0.1:{self.server.server_port}"], gate)
+        self.assertLess(gate.tokens, 1)
+        self.assertGreater(gate.blocked_until, time.monotonic())
+        self.assertEqual((gate.rate, gate.concurrency), (2, 3))
+
+    def test_configure_rejects_zero(self):
+        """rate(0)/concurrency(0) must fail loudly, not fall back to defaults."""
+        scheduler = SolasScheduler()
+        with self.assertRaisesRegex(ValueError, "must be greater than zero"):
+            scheduler.configure(self.base, rate=0)
+        with self.assertRaisesRegex(ValueError, "must be greater than zero"):
+            scheduler.configure(self.base, concurrency=0)
+
+    def test_long_retry_after_fails_fast(self):
+        """A Retry-After beyond max_retry_after returns the 429 straight away
+        and keeps later calls off the host until the wait has passed."""
+        self.server.throttle_first = 10
+        self.server.retry_after = "86400"
+        scheduler = SolasScheduler(max_retry_after=5)
+        start = time.monotonic()
+        res = scheduler.get(f"{self.base}/slow")
+        self.assertEqual(res.status_code, 429)
+        again = scheduler.get(f"{self.base}/other")
+        self.assertEqual(again.status_code, 429)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(self.server.hits, 1)
+
+    def test_stream_retry_skips_throttled_host(self):
+        """retry(n) must not resend a round of requeues to a throttling host."""
+        self.server.throttle_first = 100
+        self.server.retry_after = "0"
+        engine = SolasRuntime(SolasScheduler(rate=100, burst=100, max_requeues=2))
+        engine.run(f"""
+        stream todo from @net.api("{self.base}/todos/1") {{
+            retry(3)
+        }}
+        """)
+        self.assertEqual(self.server.hits, 3)
+
+    def test_stream_limits_apply_per_stream(self):
+        """Each stream's rate() takes effect when that stream runs."""
+        engine = SolasRuntime()
+        host = f"127.0.0.1:{self.server.server_port}"
+        engine.run(f"""
+        stream a from @net.api("{self.base}/a") {{
+            rate(2)
+            store self.scheduler.gates['{host}'].rate as first
+        }}
+        stream b from @net.api("{self.base}/b") {{
+            rate(7)
+        }}
+        """)
+        self.assertEqual(engine.storage.get("first"), 2.0)
+        self.assertEqual(engine.scheduler.gates[host].rate, 7.0)
+
+    def test_malformed_rate_is_reported(self):
+        """rate(.) must surface through run(), not escape as a ValueError."""
+        engine = SolasRuntime()
+        engine.run(f"""
+        stream todo from @net.api("{self.base}/todos/1") {{
+            rate(1.2.3)
+        }}
+        """)
+        self.assertEqual(self.server.hits, 0)
+
+if __name__ == '__main__':
+    unittest.main()